@@ -4,14 +4,19 @@ Extracts line items, sub-totals, and final totals from multi-page bills/invoices
 """
 
 import logging
+import math
+import os
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import List, Optional
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 
 from services.doc_reader import DocReader
+from services.extraction_service import close_async_clients
 from services.extractor import BillExtractor
 from services.validator import ValidationEngine
 
@@ -56,10 +61,27 @@ class InvoiceUrlInput(BaseModel):
 
 # --- Application Initialization ---
 
+def _server_process_count() -> int:
+    """Worker processes serving this app; uvicorn and gunicorn both default their worker count to WEB_CONCURRENCY"""
+    return max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Every worker has its own render pool and rate limiter; split the cores and LLM budgets between them
+    process_count = _server_process_count()
+    reader_service.start(process_count)
+    parsing_service.share_rate_limits(process_count)
+    yield
+    # Release pooled download and LLM connections and render workers on shutdown
+    await reader_service.aclose()
+    await close_async_clients()
+
 app = FastAPI(
     title="Bill Extraction API",
     description="Extract line items, sub-totals, and totals from bills/invoices",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -106,17 +128,18 @@ async def process_invoice_request(payload: InvoiceUrlInput):
     try:
         api_logger.info(f"Processing document: {payload.document}")
         
-        # Step 1: Download and process document
-        raw_page_content = await reader_service.process_document(payload.document)
+        # Step 1: Download the document and queue its pages for rendering
+        raw_page_content = await reader_service.render_document(payload.document)
         if not raw_page_content:
             raise HTTPException(
                 status_code=400,
                 detail="Failed to process document. Please check the document URL."
             )
         
-        api_logger.info(f"Document processed: {len(raw_page_content)} pages found")
+        api_logger.info(f"Document opened: {len(raw_page_content)} pages found")
         
-        # Step 2: Extract data using LLM
+        # Step 2: Extract data using LLM; pages are picked up as they finish rendering,
+        # and pages seen before are served from the extractor's page cache
         llm_output = await parsing_service.extract_bill_data(raw_page_content)
         
         if not llm_output or not llm_output.get("pagewise_line_items"):
@@ -130,25 +153,26 @@ async def process_invoice_request(payload: InvoiceUrlInput):
             llm_output["pagewise_line_items"]
         )
         
-        # Step 4: Calculate total item count
-        item_count_total = sum(
-            len(page_group["bill_items"]) for page_group in clean_data
-        )
-        
-        # Step 5: Calculate reconciled amount (sum of all item amounts)
-        calculated_total_sum = 0.0
+        # Steps 4-6: Count items, sum amounts and build page models in a single pass.
+        # The validator already coerced every field, so models are constructed without revalidation.
+        item_count_total = 0
+        item_amounts = []
+        pages_out = []
         for page_group in clean_data:
-            for entry in page_group["bill_items"]:
-                calculated_total_sum += entry.get("item_amount", 0.0)
+            entries = page_group["bill_items"]
+            item_count_total += len(entries)
+            item_amounts.extend(entry.get("item_amount", 0.0) for entry in entries)
+            pages_out.append(PageContent.model_construct(
+                page_no=page_group["page_no"],
+                page_type=page_group["page_type"],
+                bill_items=[LineEntry.model_construct(**entry) for entry in entries]
+            ))
         
-        # Round to 2 decimal places for currency
-        calculated_total_sum = round(calculated_total_sum, 2)
+        # Reconciled amount is the exactly-rounded sum of all item amounts, to 2 decimals for currency
+        calculated_total_sum = round(math.fsum(item_amounts), 2)
         
-        # Step 6: Prepare response
-        final_result = ProcessedResult(
-            pagewise_line_items=[
-                PageContent(**p) for p in clean_data
-            ],
+        final_result = ProcessedResult.model_construct(
+            pagewise_line_items=pages_out,
             total_item_count=item_count_total,
             reconciled_amount=calculated_total_sum
         )
@@ -159,9 +183,9 @@ async def process_invoice_request(payload: InvoiceUrlInput):
             "output_tokens": 0
         })
         
-        return ServiceOutput(
+        return ServiceOutput.model_construct(
             is_success=True,
-            token_usage=UsageMetrics(**usage_stats),
+            token_usage=UsageMetrics.model_construct(**usage_stats),
             data=final_result
         )
         
@@ -176,4 +200,9 @@ async def process_invoice_request(payload: InvoiceUrlInput):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    # Requests are independent and CPU-heavy in PDF rendering, so serve them from several processes
+    cpu_count = os.cpu_count() or 1
+    worker_count = int(os.getenv("WEB_CONCURRENCY", "0")) or cpu_count * 2
+    # Workers read this in lifespan to take their share of the cores and rate budgets
+    os.environ["WEB_CONCURRENCY"] = str(worker_count)
+    uvicorn.run("main:app", host="127.0.0.1", port=8000, workers=worker_count)
\ No newline at end of file
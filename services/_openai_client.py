@@ -0,0 +1,56 @@
+"""
+OpenAI Client - Process-wide async clients sharing one pooled HTTP/2 connection pool
+"""
+
+import os
+from functools import lru_cache
+from typing import List, Optional, Union
+
+import httpx
+from openai import AsyncOpenAI, AsyncAzureOpenAI
+
+# Every client handed out by get_async_client, including ones the lru_cache has since dropped
+_created_clients: List[Union[AsyncOpenAI, AsyncAzureOpenAI]] = []
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    """Keep-alive pool sized for many concurrent page requests; HTTP/2 multiplexes them"""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=64),
+        timeout=httpx.Timeout(float(os.getenv("LLM_TIMEOUT_SECONDS", "120")), connect=5.0),
+        http2=True
+    )
+
+
+@lru_cache(maxsize=2)
+def get_async_client(
+    api_key: str,
+    azure_endpoint: Optional[str] = None,
+    azure_api_version: Optional[str] = None
+) -> Union[AsyncOpenAI, AsyncAzureOpenAI]:
+    """
+    Return the shared client for this configuration
+
+    Every extractor built with the same settings reuses one client, so TLS
+    connections stay warm across requests instead of being set up per instance.
+    The SDK's own retries are disabled; extractors retry with backoff themselves.
+    """
+    if azure_endpoint:
+        client = AsyncAzureOpenAI(
+            api_key=api_key,
+            api_version=azure_api_version,
+            azure_endpoint=azure_endpoint,
+            max_retries=0,
+            http_client=_create_http_client()
+        )
+    else:
+        client = AsyncOpenAI(api_key=api_key, max_retries=0, http_client=_create_http_client())
+    _created_clients.append(client)
+    return client
+
+
+async def close_async_clients():
+    """Close every shared client and its connection pool; later calls to get_async_client build new ones"""
+    get_async_client.cache_clear()
+    while _created_clients:
+        await _created_clients.pop().close()
@@ -0,0 +1,63 @@
+"""
+TTL Cache - Small in-process LRU cache with per-entry expiry
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    LRU cache whose entries expire after a fixed number of seconds
+
+    With max_bytes set, size_of gives each value's size and least recently used
+    entries are evicted until the total fits; a value larger than the whole
+    budget is not stored.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 3600.0,
+        max_bytes: int = 0,
+        size_of: Optional[Callable[[Any], int]] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes if size_of is not None else 0
+        self._size_of = size_of
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value, size)
+        self._total_bytes = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting least recently used entries when full"""
+        size = self._size_of(value) if self.max_bytes else 0
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes > 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value, size)
+        self._total_bytes += size
+        while len(self._entries) > self.max_entries or (self.max_bytes and self._total_bytes > self.max_bytes):
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted_size
+
+    def _remove(self, key: Hashable):
+        _, _, size = self._entries.pop(key)
+        self._total_bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -2,18 +2,49 @@
 Data Validator - Validates and deduplicates extracted bill data
 """
 
+import re
 import logging
+from dataclasses import dataclass
 from typing import List, Dict, Any, Optional
 from collections import defaultdict
 
 logger = logging.getLogger(__name__)
 
+_TOTAL_KEYWORDS = (
+    "total", "subtotal", "sub-total", "grand total",
+    "final total", "net amount", "amount due",
+    "balance", "sum", "total amount", "final amount"
+)
+_TOTAL_ALTERNATION = "|".join(re.escape(keyword) for keyword in _TOTAL_KEYWORDS)
+# A total keyword on its own, optionally with one leading or trailing separator
+_TOTAL_RE = re.compile(
+    rf"(?:[-:=]\s*)?(?:{_TOTAL_ALTERNATION})|(?:{_TOTAL_ALTERNATION})(?:\s*[-:=])?"
+)
+
+
+@dataclass
+class ValidatedItem:
+    """A validated line item; slotted so bills with many rows stay compact"""
+    __slots__ = ("item_name", "item_amount", "item_rate", "item_quantity")
+    item_name: str
+    item_amount: float
+    item_rate: float
+    item_quantity: float
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "item_name": self.item_name,
+            "item_amount": self.item_amount,
+            "item_rate": self.item_rate,
+            "item_quantity": self.item_quantity
+        }
+
 
 class DataValidator:
     """Validates and deduplicates extracted bill data"""
     
     def __init__(self):
-        self.similarity_threshold = 0.8  # Threshold for considering items as duplicates
+        self.similarity_threshold = 0.8  # Jaccard similarity for considering items as duplicates
     
     def validate_and_deduplicate(
         self, 
@@ -54,12 +85,12 @@ class DataValidator:
         
         for item in bill_items:
             validated_item = self._validate_item(item)
-            if validated_item:
+            if validated_item is not None:
                 validated_page["bill_items"].append(validated_item)
         
         return validated_page
     
-    def _validate_item(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def _validate_item(self, item: Dict[str, Any]) -> Optional[ValidatedItem]:
         """Validate a single line item"""
         # Check if item has required fields
         item_name = str(item.get("item_name", "")).strip()
@@ -81,31 +112,14 @@ class DataValidator:
             logger.warning(f"Invalid numeric values for item: {item_name}")
             return None
         
-        return {
-            "item_name": item_name,
-            "item_amount": item_amount,
-            "item_rate": item_rate,
-            "item_quantity": item_quantity
-        }
+        return ValidatedItem(item_name, item_amount, item_rate, item_quantity)
     
     def _is_total_or_subtotal(self, item_name: str) -> bool:
         """Check if item name looks like a total or subtotal"""
         item_lower = item_name.lower().strip()
         
-        total_keywords = [
-            "total", "subtotal", "sub-total", "grand total",
-            "final total", "net amount", "amount due",
-            "balance", "sum", "total amount", "final amount"
-        ]
-        
         # Check if item name is primarily a total keyword
-        for keyword in total_keywords:
-            if keyword in item_lower and len(item_lower) < 30:
-                # Additional check: if it's mostly just the keyword
-                if item_lower.replace(keyword, "").strip() in ["", "-", ":", "="]:
-                    return True
-        
-        return False
+        return len(item_lower) < 30 and _TOTAL_RE.fullmatch(item_lower) is not None
     
     def _normalize_page_type(self, page_type: str) -> str:
         """Normalize page type to allowed values"""
@@ -126,8 +140,17 @@ class DataValidator:
         1. Track items by page
         2. For each page, check if items are duplicates of items in previous pages
         3. Use item name similarity and amount matching
+        
+        Names are normalized and tokenized once per item. An inverted index from
+        name token to seen items limits comparisons to items sharing at least one
+        token, and only those candidates are scored with Jaccard similarity.
+        Exact name repeats are resolved first with a single dict lookup. Items are
+        ValidatedItem records until here; surviving items are returned as dicts.
         """
-        seen_items = []  # Track items we've seen across pages
+        seen_items = []  # (item, page_no) for items we've seen across pages
+        seen_tokens = []  # Name token sets, parallel to seen_items
+        seen_exact = {}  # Normalized name -> first (item, page_no) with that name
+        token_index = defaultdict(list)  # Name token -> indices into seen_items
         deduplicated_pages = []
         
         for page in pages:
@@ -138,66 +161,63 @@ class DataValidator:
             }
             
             for item in page["bill_items"]:
+                name_norm = item.item_name.lower().strip()
+                
+                # Exact name match is always a duplicate, whatever the amount
+                exact_match = seen_exact.get(name_norm)
+                if exact_match is not None:
+                    seen_item, seen_page_no = exact_match
+                    logger.info(
+                        f"Found duplicate item: '{item.item_name}' "
+                        f"(page {page['page_no']}) matches '{seen_item.item_name}' "
+                        f"(page {seen_page_no})"
+                    )
+                    continue
+                
+                name_tokens = frozenset(name_norm.split())
+                
+                # Only items sharing a name token are considered
+                candidates = set()
+                for token in name_tokens:
+                    candidates.update(token_index.get(token, ()))
+                
                 # Check if this item is a duplicate
                 is_duplicate = False
                 
-                for seen_item in seen_items:
-                    if self._are_items_duplicate(item, seen_item):
+                for candidate_idx in sorted(candidates):
+                    seen_item, seen_page_no = seen_items[candidate_idx]
+                    name_similarity = self._calculate_name_similarity(name_tokens, seen_tokens[candidate_idx])
+                    if (name_similarity > self.similarity_threshold
+                            and self._are_amounts_close(item.item_amount, seen_item.item_amount)):
                         is_duplicate = True
                         logger.info(
-                            f"Found duplicate item: '{item['item_name']}' "
-                            f"(page {page['page_no']}) matches '{seen_item['item_name']}' "
-                            f"(page {seen_item.get('page_no', 'unknown')})"
+                            f"Found duplicate item: '{item.item_name}' "
+                            f"(page {page['page_no']}) matches '{seen_item.item_name}' "
+                            f"(page {seen_page_no})"
                         )
                         break
                 
                 if not is_duplicate:
                     # Add to current page and track it
-                    item_with_page = item.copy()
-                    item_with_page["page_no"] = page["page_no"]
-                    seen_items.append(item_with_page)
-                    deduplicated_page["bill_items"].append(item)
+                    for token in name_tokens:
+                        token_index[token].append(len(seen_items))
+                    seen_items.append((item, page["page_no"]))
+                    seen_tokens.append(name_tokens)
+                    seen_exact[name_norm] = (item, page["page_no"])
+                    deduplicated_page["bill_items"].append(item.to_dict())
             
             deduplicated_pages.append(deduplicated_page)
         
         return deduplicated_pages
     
-    def _are_items_duplicate(self, item1: Dict[str, Any], item2: Dict[str, Any]) -> bool:
-        """Check if two items are duplicates"""
-        name1 = item1["item_name"].lower().strip()
-        name2 = item2["item_name"].lower().strip()
-        
-        # Exact name match
-        if name1 == name2:
-            return True
-        
-        # Similar name and similar amount (likely same item)
-        name_similarity = self._calculate_name_similarity(name1, name2)
-        amount_diff = abs(item1["item_amount"] - item2["item_amount"])
-        
-        # If names are very similar and amounts are close, likely duplicate
-        if name_similarity > self.similarity_threshold:
-            # Allow small differences in amount (rounding, etc.)
-            if amount_diff < 0.01 or (amount_diff / max(abs(item1["item_amount"]), 0.01)) < 0.05:
-                return True
-        
-        return False
-    
-    def _calculate_name_similarity(self, name1: str, name2: str) -> float:
-        """Calculate similarity between two item names"""
-        # Simple similarity based on common words and characters
-        words1 = set(name1.split())
-        words2 = set(name2.split())
-        
+    def _calculate_name_similarity(self, words1: frozenset, words2: frozenset) -> float:
+        """Calculate Jaccard similarity between two item name token sets"""
         if not words1 or not words2:
             return 0.0
         
-        # Jaccard similarity
-        intersection = len(words1.intersection(words2))
-        union = len(words1.union(words2))
-        
-        if union == 0:
-            return 0.0
-        
-        return intersection / union
-
+        return len(words1 & words2) / len(words1 | words2)
+    
+    def _are_amounts_close(self, amount1: float, amount2: float) -> bool:
+        """Check if two amounts of similarly named items match (rounding, etc.)"""
+        amount_diff = abs(amount1 - amount2)
+        return amount_diff < 0.01 or (amount_diff / max(abs(amount1), 0.01)) < 0.05
@@ -2,65 +2,203 @@
 Doc Reader - Handles downloading and processing documents (PDFs, images)
 """
 
-import requests
+import os
+import asyncio
+import hashlib
 import logging
-from typing import List, Dict, Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Awaitable, Optional, Tuple, Union
 from io import BytesIO
 from PIL import Image
 import fitz  # PyMuPDF
-import base64
+import pybase64
+import httpx
 from dotenv import load_dotenv
 
+from .cache import TTLCache
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# First byte -> (magic signature, file type); each leading byte maps to one candidate signature
+_MAGIC_SIGNATURES = {
+    0x25: (b'%PDF', "pdf"),
+    0x89: (b'\x89PNG\r\n\x1a\n', "png"),
+    0xff: (b'\xff\xd8\xff', "jpeg"),
+    0x49: (b'II*\x00', "tiff"),
+    0x4d: (b'MM\x00*', "tiff"),
+}
+
+# Transient download failures worth retrying; read timeouts are not retried to keep latency bounded
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadError, httpx.RemoteProtocolError)
+_MAX_RETRIES = 3
+_RETRY_BACKOFF_SECONDS = 0.3
+
+# Bytes inspected for an HTML page before the rest of the body is downloaded
+_SNIFF_BYTES = 512
+
+_HTML_ERROR_MSG = "The URL appears to be a sharing link that returns HTML instead of the file. "
+
+
+def sniff_file_type(content: bytes) -> Optional[str]:
+    """Identify a document from its magic bytes, returning None if unrecognized"""
+    if not content:
+        return None
+    candidate = _MAGIC_SIGNATURES.get(content[0])
+    if candidate is not None and content.startswith(candidate[0]):
+        return candidate[1]
+    return None
+
+
+# Parsed documents kept by each render worker, so a document is opened once per worker
+# rather than once per page. Thread-local so a thread never reuses another thread's document.
+_OPEN_DOCUMENTS_PER_WORKER = 2
+_worker_state = threading.local()
+# PyMuPDF is not thread-safe, so renders outside a process pool run one at a time
+_THREAD_RENDER_LOCK = threading.Lock()
+
+
+def _open_document(pdf_content: bytes, document_key: str) -> fitz.Document:
+    """Return this worker's parsed copy of the document, opening it on first use"""
+    open_documents = getattr(_worker_state, "documents", None)
+    if open_documents is None:
+        open_documents = _worker_state.documents = OrderedDict()
+    pdf_document = open_documents.get(document_key)
+    if pdf_document is not None:
+        open_documents.move_to_end(document_key)
+        return pdf_document
+    pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
+    open_documents[document_key] = pdf_document
+    while len(open_documents) > _OPEN_DOCUMENTS_PER_WORKER:
+        _, evicted_document = open_documents.popitem(last=False)
+        evicted_document.close()
+    return pdf_document
+
+
+def _render_page_in_thread(pdf_content: bytes, page_idx: int, document_key: str) -> Dict[str, any]:
+    """Rasterize one PDF page on a thread-pool thread, holding the module-wide render lock"""
+    with _THREAD_RENDER_LOCK:
+        return _render_page(pdf_content, page_idx, document_key)
+
+
+def _render_page(pdf_content: bytes, page_idx: int, document_key: str) -> Dict[str, any]:
+    """Rasterize one PDF page; module-level so it can run in a worker process"""
+    page = _open_document(pdf_content, document_key)[page_idx]
+    mat = fitz.Matrix(1.5, 1.5)
+    pix = page.get_pixmap(matrix=mat)
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    jpeg_bytes = pix.tobytes("jpeg", jpg_quality=80)
+    img_base64 = pybase64.b64encode(jpeg_bytes).decode('ascii')
+    return {
+        "page_no": str(page_idx + 1),
+        "image_base64": img_base64
+    }
+
 
 class DocReader:
     """Processes documents from URLs and extracts page images"""
     
     def __init__(self):
         self.supported_formats = ['.pdf', '.png', '.jpg', '.jpeg', '.tiff', '.bmp']
+        self._client = httpx.AsyncClient(
+            timeout=30,
+            http2=True,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=32)
+        )
+        self._render_pool: Optional[ProcessPoolExecutor] = None
+        self.max_document_bytes = int(os.getenv("MAX_DOCUMENT_BYTES", str(50 * 1024 * 1024)))
+        self._page_cache = TTLCache(
+            max_entries=int(os.getenv("DOC_CACHE_MAX_ENTRIES", "256")),
+            ttl_seconds=float(os.getenv("DOC_CACHE_TTL_SECONDS", "3600")),
+            # Bounded by the encoded page images, which are nearly all of an entry's memory
+            max_bytes=int(os.getenv("DOC_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+            size_of=lambda pages: sum(len(page["image_base64"]) for page in pages)
+        )
+
+    def start(self, process_count: int = 1):
+        """Start the render pool; without PDF_RENDER_WORKERS the cores are split across process_count servers"""
+        workers = int(os.getenv("PDF_RENDER_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // max(1, process_count))
+        self._render_pool = ProcessPoolExecutor(max_workers=workers)
+        logger.info(f"Started PDF render pool with {workers} workers")
+    
+    async def aclose(self):
+        await self._client.aclose()
+        if self._render_pool is not None:
+            self._render_pool.shutdown(cancel_futures=True)
+            self._render_pool = None
     
     async def process_document(self, document_url: str) -> List[Dict[str, any]]:
         """
         Download and process document, returning list of page data
+
+        Pages are cached by URL, so repeated requests skip the download and rendering.
         """
-        try:
-            logger.info(f"Downloading document from: {document_url}")
-            response = requests.get(document_url, timeout=30)
-            response.raise_for_status()
+        pages = await self.render_document(document_url)
+        return [await page if asyncio.isfuture(page) else page for page in pages]
+
+    async def render_document(self, document_url: str) -> List[Union[Dict[str, any], Awaitable[Dict[str, any]]]]:
+        """
+        Download the document and queue every page for rendering without waiting for them
+
+        Entries are in page order. PDF pages are futures that resolve as each page finishes
+        rendering, so callers can start on early pages while later ones are still rendering.
+        The rendered pages are cached by URL once all of them succeed.
+        """
+        cached_pages = self._page_cache.get(document_url)
+        if cached_pages is not None:
+            logger.info(f"Using cached pages for: {document_url}")
+            return cached_pages
+        pages = await self._load_document(document_url)
+        rendering = [page for page in pages if asyncio.isfuture(page)]
+        if not rendering:
+            self._page_cache.set(document_url, pages)
+            return pages
 
-            content_type = response.headers.get('content-type', '').lower()
-            content_preview = response.content[:500] if len(response.content) > 500 else response.content
+        remaining = len(rendering)
 
-            if 'text/html' in content_type or content_preview.startswith(b'<!DOCTYPE') or content_preview.startswith(b'<html') or b'<html' in content_preview.lower():
-                error_msg = (
-                    "The URL appears to be a sharing link that returns HTML instead of the file. "
+        def page_rendered(task: asyncio.Future):
+            # Runs before any awaiting caller resumes, so the cache is filled by the time the last page is read.
+            # Reading the exception also marks it retrieved if no caller awaited the failed page.
+            nonlocal remaining
+            if task.cancelled() or task.exception() is not None:
+                return
+            remaining -= 1
+            if remaining == 0:
+                self._page_cache.set(
+                    document_url, [page.result() if asyncio.isfuture(page) else page for page in pages]
                 )
-                logger.error(error_msg)
-                raise ValueError(error_msg)
 
-            if len(response.content) < 100:
-                raise ValueError(f"Downloaded content is too small ({len(response.content)} bytes).")
+        for task in rendering:
+            task.add_done_callback(page_rendered)
+        return pages
+
+    async def _load_document(self, document_url: str) -> List[Union[Dict[str, any], Awaitable[Dict[str, any]]]]:
+        try:
+            logger.info(f"Downloading document from: {document_url}")
+            content, content_type = await self._download(document_url)
+
+            if len(content) < 100:
+                raise ValueError(f"Downloaded content is too small ({len(content)} bytes).")
 
             file_extension = self._get_file_extension(document_url)
 
             is_pdf = False
             is_image = False
 
-            if response.content.startswith(b'%PDF'):
+            file_type = sniff_file_type(content)
+
+            if file_type == "pdf":
                 is_pdf = True
                 logger.info("Detected PDF from file content (magic bytes)")
-            elif response.content.startswith(b'\x89PNG\r\n\x1a\n'):
-                is_image = True
-                logger.info("Detected PNG from file content")
-            elif response.content.startswith(b'\xff\xd8\xff'):
+            elif file_type is not None:
                 is_image = True
-                logger.info("Detected JPEG from file content")
-            elif response.content.startswith(b'II*\x00') or response.content.startswith(b'MM\x00*'):
-                is_image = True
-                logger.info("Detected TIFF from file content")
+                logger.info(f"Detected {file_type.upper()} from file content")
             elif 'pdf' in content_type or file_extension == '.pdf':
                 is_pdf = True
                 logger.info("Detected PDF from content-type or extension")
@@ -71,49 +209,105 @@ class DocReader:
             pages_data = []
 
             if is_pdf:
-                pages_data = await self._process_pdf(response.content)
+                pages_data = await self._process_pdf(content)
             elif is_image:
-                pages_data = await self._process_image(response.content, 1)
+                pages_data = await self._process_image(content, 1)
             else:
                 logger.warning("File type not clearly identified, attempting to process as image")
-                pages_data = await self._process_image(response.content, 1)
+                pages_data = await self._process_image(content, 1)
 
-            logger.info(f"Processed {len(pages_data)} pages")
+            logger.info(f"Loaded {len(pages_data)} pages")
             return pages_data
 
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error downloading document: {str(e)}")
             raise
         except Exception as e:
             logger.error(f"Error processing document: {str(e)}")
             raise
 
-    async def _process_pdf(self, pdf_content: bytes) -> List[Dict[str, any]]:
+    async def _download(self, document_url: str) -> Tuple[bytes, str]:
+        """
+        Stream the document, retrying connection errors and 429/5xx responses with backoff
+
+        Returns the body and its lower-cased content type.
+        """
+        for attempt in range(_MAX_RETRIES + 1):
+            try:
+                async with self._client.stream("GET", document_url) as response:
+                    if response.status_code not in _RETRY_STATUSES or attempt == _MAX_RETRIES:
+                        response.raise_for_status()
+                        content_type = response.headers.get('content-type', '').lower()
+                        return await self._read_body(response, content_type), content_type
+                    logger.warning(f"Download returned HTTP {response.status_code}, retrying (attempt {attempt + 1})")
+            except _RETRY_EXCEPTIONS as e:
+                if attempt == _MAX_RETRIES:
+                    raise
+                logger.warning(f"Download failed: {str(e)}, retrying (attempt {attempt + 1})")
+            await asyncio.sleep(_RETRY_BACKOFF_SECONDS * (2 ** attempt))
+
+    async def _read_body(self, response: httpx.Response, content_type: str) -> bytes:
+        """Read the body, aborting without downloading the rest on HTML pages or oversized files"""
+        if 'text/html' in content_type:
+            logger.error(_HTML_ERROR_MSG)
+            raise ValueError(_HTML_ERROR_MSG)
+
+        declared_length = response.headers.get('content-length', '')
+        if declared_length.isdigit() and int(declared_length) > self.max_document_bytes:
+            raise ValueError(f"Document is too large ({declared_length} bytes, limit {self.max_document_bytes}).")
+
+        chunks = []
+        size = 0
+        head_checked = False
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > self.max_document_bytes:
+                raise ValueError(f"Document is too large (over {self.max_document_bytes} bytes).")
+            if not head_checked and size >= _SNIFF_BYTES:
+                self._reject_html(b"".join(chunks)[:_SNIFF_BYTES])
+                head_checked = True
+
+        content = b"".join(chunks)
+        if not head_checked:
+            self._reject_html(content)
+        return content
+
+    def _reject_html(self, head: bytes):
+        if head.startswith(b'<!DOCTYPE') or head.startswith(b'<html') or b'<html' in head.lower():
+            logger.error(_HTML_ERROR_MSG)
+            raise ValueError(_HTML_ERROR_MSG)
+
+    async def _process_pdf(self, pdf_content: bytes) -> List[asyncio.Task]:
+        """Queue every page on the render pool, returning one task per page in page order"""
         try:
-            pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
-            pages_data = []
-            for page_num in range(len(pdf_document)):
-                page = pdf_document[page_num]
-                mat = fitz.Matrix(2.0, 2.0)
-                pix = page.get_pixmap(matrix=mat)
-                img_data = pix.tobytes("png")
-                image = Image.open(BytesIO(img_data))
-                if image.mode != 'RGB':
-                    image = image.convert('RGB')
-                img_buffer = BytesIO()
-                image.save(img_buffer, format='PNG')
-                img_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
-                pages_data.append({
-                    "page_no": str(page_num + 1),
-                    "image_base64": img_base64,
-                    "image": image
-                })
-            pdf_document.close()
-            logger.info(f"Converted {len(pages_data)} PDF pages to images")
-            return pages_data
+            with fitz.open(stream=pdf_content, filetype="pdf") as pdf_document:
+                page_count = len(pdf_document)
         except Exception as e:
             logger.error(f"Error converting PDF: {str(e)}")
             raise ValueError(f"Failed to process PDF: {str(e)}")
+        logger.info(f"Rendering {page_count} PDF pages")
+        # Identifies the document to the workers' open-document caches
+        document_key = hashlib.blake2b(pdf_content, digest_size=16).hexdigest()
+        return [
+            asyncio.ensure_future(self._render_pdf_page(pdf_content, page_idx, document_key))
+            for page_idx in range(page_count)
+        ]
+
+    async def _render_pdf_page(self, pdf_content: bytes, page_idx: int, document_key: str) -> Dict[str, any]:
+        try:
+            loop = asyncio.get_running_loop()
+            if self._render_pool is None:
+                # Without a started pool, pages render one at a time on the default thread executor
+                return await loop.run_in_executor(
+                    None, _render_page_in_thread, pdf_content, page_idx, document_key
+                )
+            return await loop.run_in_executor(
+                self._render_pool, _render_page, pdf_content, page_idx, document_key
+            )
+        except Exception as e:
+            logger.error(f"Error converting PDF page {page_idx + 1}: {str(e)}")
+            raise ValueError(f"Failed to process PDF: {str(e)}")
 
     async def _process_image(self, image_content: bytes, page_no: int = 1) -> List[Dict[str, any]]:
         try:
@@ -131,11 +325,10 @@ class DocReader:
                 image = image.convert('RGB')
             img_buffer = BytesIO()
             image.save(img_buffer, format='PNG')
-            img_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
+            img_base64 = pybase64.b64encode(img_buffer.getbuffer()).decode('ascii')
             return [{
                 "page_no": str(page_no),
-                "image_base64": img_base64,
-                "image": image
+                "image_base64": img_base64
             }]
         except ValueError:
             raise
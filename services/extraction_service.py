@@ -3,21 +3,155 @@ Extraction Service - Uses LLM to extract structured data from bill images
 """
 
 import os
+import copy
+import hashlib
+import inspect
 import logging
 import asyncio
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, AsyncIterable, AsyncIterator, Awaitable, Iterable, Optional, Union, Any
 import json
-from openai import OpenAI, AzureOpenAI
+import orjson
+import numpy as np
+from openai import APIConnectionError, APITimeoutError, BadRequestError, InternalServerError, RateLimitError
+from tenacity import AsyncRetrying, RetryCallState, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 from dotenv import load_dotenv
 
+from ._openai_client import close_async_clients, get_async_client  # noqa: F401 (close_async_clients re-exported)
+from .cache import TTLCache
+from .image_utils import prepare_image_for_llm
+from .rate_limiter import RateLimiter
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the prompts change so cached page extractions are invalidated
+PROMPT_VERSION = "v1"
+
+# Shared by single-page and batched requests
+SYSTEM_PROMPT = """You are an expert at extracting structured data from bills and invoices. 
+Your task is to extract all line items from the bill with the following information:
+- item_name: The exact name/description of the item as shown in the bill
+- item_amount: The net amount (after discounts) for this line item
+- item_rate: The unit rate/price of the item
+- item_quantity: The quantity of the item
+
+Also identify the page_type which can be:
+- "Bill Detail" - if this page contains detailed line items
+- "Final Bill" - if this page contains final totals/summary
+- "Pharmacy" - if this is a pharmacy bill
+
+IMPORTANT:
+1. Extract ALL line items - do not miss any
+2. Do not include sub-totals or totals as line items
+3. Extract exact values as shown in the bill
+4. If a field is not available, use 0.0 for numeric fields
+5. Return valid JSON only"""
+
+# Single-page user prompt; {page_no} is filled in per request
+USER_PROMPT_TEMPLATE = """Extract all line items from this page (page {page_no}) of the bill.
+
+Return a JSON object with this exact structure:
+{{
+    "page_no": "{page_no}",
+    "page_type": "Bill Detail" | "Final Bill" | "Pharmacy",
+    "bill_items": [
+        {{
+            "item_name": "exact item name from bill",
+            "item_amount": <float>,
+            "item_rate": <float>,
+            "item_quantity": <float>
+        }}
+    ]
+}}
+
+Extract every single line item. Be thorough and accurate."""
+
+# Multi-page variant of the user prompt; each image is preceded by a PAGE_<n> label
+BATCH_USER_PROMPT = """You are given {page_count} pages of the same bill. Each page image is preceded by its label PAGE_<n>.
+Extract all line items from every page, keeping each page separate.
+
+Return a JSON object with this exact structure:
+{{
+    "pages": [
+        {{
+            "page_no": "<n from the PAGE_<n> label>",
+            "page_type": "Bill Detail" | "Final Bill" | "Pharmacy",
+            "bill_items": [
+                {{
+                    "item_name": "exact item name from bill",
+                    "item_amount": <float>,
+                    "item_rate": <float>,
+                    "item_quantity": <float>
+                }}
+            ]
+        }}
+    ]
+}}
+
+Return one entry for every labeled page, even if it has no line items. Extract every single line item. Be thorough and accurate."""
+
+
+# A page dict, or an awaitable resolving to one while the page is still being rendered
+PageInput = Union[Dict[str, Any], Awaitable[Dict[str, Any]]]
+
+
+async def iter_page_batches(
+    pages: Union[Iterable[PageInput], AsyncIterable[PageInput]],
+    size: int
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Group pages into batches of at most `size`
+
+    Pages may come from a list or an async stream, and each may be a page dict or an
+    awaitable resolving to one (e.g. a page still rendering). Awaitables are awaited
+    in order, so a batch is handed on as soon as its own pages are ready.
+    """
+    async def iter_pages():
+        if hasattr(pages, "__aiter__"):
+            async for page in pages:
+                yield page
+        else:
+            for page in pages:
+                yield page
+    
+    batch = []
+    async for page in iter_pages():
+        if inspect.isawaitable(page):
+            page = await page
+        batch.append(page)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Transient API failures worth retrying; other errors (e.g. BadRequestError) fail immediately
+_RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+
+def _log_retry(retry_state: RetryCallState):
+    error = retry_state.outcome.exception()
+    logger.warning(
+        f"LLM call failed with {type(error).__name__}, retrying in {retry_state.next_action.sleep:.1f}s "
+        f"(attempt {retry_state.attempt_number})"
+    )
+
+
+# Rough per-page input token cost of the prompt plus image, used for TPM budgeting
+ESTIMATED_PROMPT_TOKENS = 2000
+
 
 class ExtractionService:
     """Service for extracting bill data using LLM vision models"""
     
+    # Prompts are read from the class so subclasses can supply their own along with a PROMPT_VERSION
+    PROMPT_VERSION = PROMPT_VERSION
+    PROMPT_SYSTEM = SYSTEM_PROMPT
+    PROMPT_USER_TEMPLATE = USER_PROMPT_TEMPLATE
+    PROMPT_BATCH_TEMPLATE = BATCH_USER_PROMPT
+    
     def __init__(self):
         # Check if using Azure OpenAI
         use_azure = os.getenv("USE_AZURE_OPENAI", "false").lower() == "true"
@@ -43,14 +177,8 @@ class ExtractionService:
             # Ensure endpoint doesn't have trailing slash
             azure_endpoint = azure_endpoint.rstrip('/')
             
-            # For Azure OpenAI, use AzureOpenAI client or configure base_url properly
-            from openai import AzureOpenAI
-            
-            self.client = AzureOpenAI(
-                api_key=azure_api_key,
-                api_version=azure_api_version,
-                azure_endpoint=azure_endpoint
-            )
+            # Clients are shared per configuration so connections are reused across instances
+            self.client = get_async_client(azure_api_key, azure_endpoint, azure_api_version)
             self.model = deployment_name  # Use deployment name as model
             logger.info(f"Using Azure OpenAI Deployment: {deployment_name}")
         else:
@@ -59,155 +187,354 @@ class ExtractionService:
             if not api_key:
                 raise ValueError("OPENAI_API_KEY environment variable is required")
             
-            self.client = OpenAI(api_key=api_key)
+            self.client = get_async_client(api_key)
             self.model = os.getenv("OPENAI_MODEL", "gpt-4-vision-preview")
             logger.info(f"Using standard OpenAI with model: {self.model}")
         
-        self.token_usage = {
-            "total_tokens": 0,
-            "input_tokens": 0,
-            "output_tokens": 0
+        # Throttling: cap in-flight calls and stay under the RPM/TPM budgets (0 = unlimited);
+        # transient failures are retried up to max_attempts times in total
+        self.max_concurrent_requests = int(os.getenv("LLM_MAX_CONCURRENT", "8"))
+        self.max_attempts = int(os.getenv("LLM_MAX_ATTEMPTS", "5"))
+        self.max_tokens = 4000  # Output budget per page
+        # Batched requests get max_tokens per page, capped at the model's output limit
+        self.max_output_tokens = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "4096"))
+        # Pages sent per request; batching divides the request count under RPM limits (opt-in)
+        self.batch_pages = max(1, int(os.getenv("LLM_BATCH_PAGES", "1")))
+        self.temperature = 0.1
+        # JSON mode guarantees a parseable object; it is switched off if the model rejects it
+        self.json_mode = os.getenv("LLM_JSON_MODE", "true").lower() == "true"
+        self._llm_semaphore: Optional[asyncio.Semaphore] = None
+        
+        # Vision input size: images are bounded and JPEG-encoded, and the detail tier is explicit
+        self.image_max_dim = int(os.getenv("IMG_MAX_DIM", "1536"))
+        self.image_detail = os.getenv("IMG_DETAIL", "auto")
+        
+        # The system message never changes, so it is built once and shared by every request
+        self._system_message = {"role": "system", "content": self.PROMPT_SYSTEM}
+        self._rate_limiter = self._create_rate_limiter()
+        
+        # Page extractions keyed by image content, so repeated pages skip the LLM call
+        self.cache_enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+        self._page_cache = TTLCache(
+            max_entries=int(os.getenv("LLM_PAGE_CACHE_MAX_ENTRIES", "2048")),
+            ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        )
+    
+    def _create_rate_limiter(self, process_count: int = 1) -> RateLimiter:
+        """Limiter holding this process's share of the LLM_RPM/LLM_TPM budgets"""
+        return RateLimiter(
+            requests_per_minute=float(os.getenv("LLM_RPM", "0")) / process_count,
+            tokens_per_minute=float(os.getenv("LLM_TPM", "0")) / process_count
+        )
+    
+    def share_rate_limits(self, process_count: int):
+        """Split the rate budgets evenly across the server processes; call before serving requests"""
+        self._rate_limiter = self._create_rate_limiter(max(1, process_count))
+    
+    def _image_block(self, llm_image_base64: str) -> Dict[str, Any]:
+        """Content block carrying one prepared page image"""
+        return {
+            "type": "image_url",
+            "image_url": {"url": "data:image/jpeg;base64," + llm_image_base64, "detail": self.image_detail}
         }
     
-    async def extract_bill_data(self, pages_data: List[Dict[str, any]]) -> Dict[str, Any]:
+    def _page_cache_key(self, image_base64: str) -> str:
+        """Content-addressed key covering everything that shapes the LLM output"""
+        digest = hashlib.sha256(image_base64.encode("ascii"))
+        params = f"|{self.model}|{self.PROMPT_VERSION}|{self.temperature}|{self.image_max_dim}|{self.image_detail}"
+        digest.update(params.encode())
+        return digest.hexdigest()
+    
+    def _get_llm_semaphore(self) -> asyncio.Semaphore:
+        """Create the concurrency cap lazily so it binds to the serving event loop"""
+        if self._llm_semaphore is None:
+            self._llm_semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        return self._llm_semaphore
+    
+    async def _create_completion(self, pages: int = 1, **request) -> Any:
+        """Call the chat completions API within the rate limits, retrying transient failures with backoff"""
+        estimated_tokens = request["max_tokens"] + ESTIMATED_PROMPT_TOKENS * pages
+        retrying = AsyncRetrying(
+            retry=retry_if_exception_type(_RETRYABLE_ERRORS),
+            wait=wait_random_exponential(min=1, max=32),
+            stop=stop_after_attempt(self.max_attempts),
+            before_sleep=_log_retry,
+            reraise=True
+        )
+        async for attempt in retrying:
+            with attempt:
+                if self.json_mode:
+                    request["response_format"] = {"type": "json_object"}
+                await self._rate_limiter.acquire(estimated_tokens)
+                try:
+                    return await self._send_completion(request)
+                except BadRequestError as e:
+                    # Older vision models don't support JSON mode; fall back to parsing fenced output
+                    if "response_format" not in request or "response_format" not in str(e):
+                        raise
+                    logger.warning(f"Model {self.model} rejected JSON mode, continuing without it")
+                    self.json_mode = False
+                    request.pop("response_format")
+                    await self._rate_limiter.acquire(estimated_tokens)
+                    return await self._send_completion(request)
+    
+    async def _send_completion(self, request: Dict[str, Any]) -> Any:
+        async with self._get_llm_semaphore():
+            return await self.client.chat.completions.create(**request)
+    
+    async def extract_bill_data(
+        self,
+        pages_data: Union[Iterable[PageInput], AsyncIterable[PageInput]]
+    ) -> Dict[str, Any]:
         """
         Extract bill data from pages using LLM
         
+        Pages are pulled lazily and handed to a bounded pool of workers, so an async
+        page stream only holds the images that are queued or in flight.
+        
         Args:
-            pages_data: List of page dictionaries with image data
+            pages_data: List or async iterable of page dictionaries with image data,
+                or of awaitables resolving to them
             
         Returns:
             Dictionary with pagewise_line_items and token_usage
         """
-        # Reset token usage
-        self.token_usage = {
+        # Token usage for this call only; pages update it from the same event loop
+        token_usage = {
             "total_tokens": 0,
             "input_tokens": 0,
             "output_tokens": 0
         }
         
+        worker_count = max(1, self.max_concurrent_requests)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=2 * worker_count)
+        batch_results: Dict[int, List[Optional[Dict[str, Any]]]] = {}
+        
+        async def extract_worker():
+            while True:
+                job = await queue.get()
+                if job is None:
+                    return
+                batch_index, batch = job
+                try:
+                    batch_results[batch_index] = await self._extract_batch_data(batch, token_usage)
+                except Exception as e:
+                    page_numbers = ", ".join(page_data["page_no"] for page_data in batch)
+                    logger.error(f"Error extracting data from pages {page_numbers}: {str(e)}")
+                    batch_results[batch_index] = [
+                        {
+                            "page_no": page_data["page_no"],
+                            "page_type": "Bill Detail",
+                            "bill_items": []
+                        }
+                        for page_data in batch
+                    ]
+        
+        workers = [asyncio.ensure_future(extract_worker()) for _ in range(worker_count)]
+        try:
+            batch_count = 0
+            async for batch in iter_page_batches(pages_data, self.batch_pages):
+                await queue.put((batch_count, batch))
+                batch_count += 1
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        except BaseException:
+            # A failing page stream (or cancellation) must not leave workers waiting on the queue
+            for worker in workers:
+                worker.cancel()
+            raise
+        
+        # Reassemble in page order; workers finish batches out of order
         pagewise_line_items = []
         
-        for idx, page_data in enumerate(pages_data):
-            page_no = page_data["page_no"]
-            image_base64 = page_data["image_base64"]
-            
-            logger.info(f"Extracting data from page {page_no}")
-            
-            # Add a small delay between requests to avoid rate limiting
-            # Skip delay for the first page
-            if idx > 0:
-                delay = float(os.getenv("PAGE_PROCESSING_DELAY", "2.0"))  # Default 2 seconds
-                logger.debug(f"Waiting {delay} seconds before processing next page...")
-                await asyncio.sleep(delay)
-            
-            # Extract data from this page
-            page_result = await self._extract_page_data(page_no, image_base64)
-            
-            if page_result:
-                pagewise_line_items.append(page_result)
+        for batch_index in range(batch_count):
+            pagewise_line_items.extend(
+                page_result for page_result in batch_results[batch_index] if page_result
+            )
         
         return {
             "pagewise_line_items": pagewise_line_items,
-            "token_usage": self.token_usage
+            "token_usage": token_usage
         }
     
-    async def _extract_page_data(self, page_no: str, image_base64: str) -> Optional[Dict[str, Any]]:
-        """Extract data from a single page"""
+    def _get_cached_page(self, cache_key: Optional[str], page_no: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of a cached extraction for this page, or None"""
+        if cache_key is None:
+            return None
+        cached_page = self._page_cache.get(cache_key)
+        if cached_page is None:
+            return None
+        logger.info(f"Page {page_no} served from extraction cache")
+        # Copy so callers can't mutate the cached entry; the same image may sit on another page
+        page_data = copy.deepcopy(cached_page)
+        page_data["page_no"] = page_no
+        return page_data
+    
+    def _normalize_page(self, page_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill in missing fields and coerce numeric fields to float"""
+        # Validate structure
+        if "bill_items" not in page_data:
+            page_data["bill_items"] = []
+        if not isinstance(page_data["bill_items"], list):
+            raise TypeError(f"bill_items must be a list, got {type(page_data['bill_items']).__name__}")
         
-        system_prompt = """You are an expert at extracting structured data from bills and invoices. 
-Your task is to extract all line items from the bill with the following information:
-- item_name: The exact name/description of the item as shown in the bill
-- item_amount: The net amount (after discounts) for this line item
-- item_rate: The unit rate/price of the item
-- item_quantity: The quantity of the item
-
-Also identify the page_type which can be:
-- "Bill Detail" - if this page contains detailed line items
-- "Final Bill" - if this page contains final totals/summary
-- "Pharmacy" - if this is a pharmacy bill
-
-IMPORTANT:
-1. Extract ALL line items - do not miss any
-2. Do not include sub-totals or totals as line items
-3. Extract exact values as shown in the bill
-4. If a field is not available, use 0.0 for numeric fields
-5. Return valid JSON only"""
-
-        user_prompt = f"""Extract all line items from this page (page {page_no}) of the bill.
-
-Return a JSON object with this exact structure:
-{{
-    "page_no": "{page_no}",
-    "page_type": "Bill Detail" | "Final Bill" | "Pharmacy",
-    "bill_items": [
-        {{
-            "item_name": "exact item name from bill",
-            "item_amount": <float>,
-            "item_rate": <float>,
-            "item_quantity": <float>
-        }}
-    ]
-}}
-
-Extract every single line item. Be thorough and accurate."""
+        coerce_bill_items(page_data["bill_items"])
+        return page_data
+    
+    async def _extract_batch_data(
+        self,
+        batch: List[Dict[str, Any]],
+        token_usage: Dict[str, int]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Extract several pages with one request, falling back to one request per page"""
+        if len(batch) == 1:
+            return [await self._extract_page_data(batch[0]["page_no"], batch[0]["image_base64"], token_usage)]
+        
+        # Serve cached pages first so only the misses are sent to the LLM
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        pending = []
+        for page_data in batch:
+            cache_key = self._page_cache_key(page_data["image_base64"]) if self.cache_enabled else None
+            cached_page = self._get_cached_page(cache_key, page_data["page_no"])
+            if cached_page is not None:
+                results[page_data["page_no"]] = cached_page
+            else:
+                pending.append((page_data, cache_key))
+        
+        if len(pending) == 1:
+            page_data = pending[0][0]
+            results[page_data["page_no"]] = await self._extract_page_data(
+                page_data["page_no"], page_data["image_base64"], token_usage
+            )
+        elif pending:
+            page_numbers = [page_data["page_no"] for page_data, _ in pending]
+            logger.info(f"Extracting data from pages {', '.join(page_numbers)} in one request")
+            
+            try:
+                # Downscaling is CPU-bound, so keep it off the event loop
+                llm_images = await asyncio.gather(*[
+                    asyncio.to_thread(prepare_image_for_llm, page_data["image_base64"], self.image_max_dim)
+                    for page_data, _ in pending
+                ])
+                
+                content_blocks = [
+                    {"type": "text", "text": self.PROMPT_BATCH_TEMPLATE.format(page_count=len(pending))}
+                ]
+                for page_no, llm_image_base64 in zip(page_numbers, llm_images):
+                    content_blocks.append({"type": "text", "text": f"PAGE_{page_no}"})
+                    content_blocks.append(self._image_block(llm_image_base64))
+                
+                response = await self._create_completion(
+                    pages=len(pending),
+                    model=self.model,
+                    messages=[self._system_message, {"role": "user", "content": content_blocks}],
+                    max_tokens=min(self.max_tokens * len(pending), self.max_output_tokens),
+                    temperature=self.temperature
+                )
+                
+                # Update token usage
+                usage = response.usage
+                token_usage["total_tokens"] += usage.total_tokens
+                token_usage["input_tokens"] += usage.prompt_tokens
+                token_usage["output_tokens"] += usage.completion_tokens
+                
+                choice = response.choices[0]
+                if getattr(choice, "finish_reason", None) == "length":
+                    raise ValueError("response was truncated at max_tokens")
+                batch_data = parse_json_response(choice.message.content)
+                
+                # Split the combined response back into per-page results
+                returned_pages = {
+                    str(page_result.get("page_no")): page_result
+                    for page_result in (batch_data.get("pages", []) if isinstance(batch_data, dict) else [])
+                    if isinstance(page_result, dict)
+                }
+                for page_data, cache_key in pending:
+                    page_result = returned_pages.get(page_data["page_no"])
+                    if page_result is None:
+                        continue
+                    page_result["page_no"] = page_data["page_no"]
+                    page_result.setdefault("page_type", "Bill Detail")
+                    # A malformed page is left for the single-page retry; its neighbours are kept
+                    try:
+                        results[page_data["page_no"]] = self._normalize_page(page_result)
+                    except Exception as e:
+                        logger.warning(f"Malformed batch result for page {page_data['page_no']}: {str(e)}")
+                        continue
+                    if cache_key is not None:
+                        self._page_cache.set(cache_key, copy.deepcopy(page_result))
+                
+            except Exception as e:
+                logger.warning(
+                    f"Batch request for pages {', '.join(page_numbers)} failed, "
+                    f"retrying one page per request: {str(e)}"
+                )
+            
+            # Pages the batch response did not cover are retried on their own
+            missing = [page_data for page_data, _ in pending if page_data["page_no"] not in results]
+            if missing:
+                single_results = await asyncio.gather(*[
+                    self._extract_page_data(page_data["page_no"], page_data["image_base64"], token_usage)
+                    for page_data in missing
+                ])
+                for page_data, page_result in zip(missing, single_results):
+                    results[page_data["page_no"]] = page_result
+        
+        return [results[page_data["page_no"]] for page_data in batch]
+    
+    async def _extract_page_data(
+        self,
+        page_no: str,
+        image_base64: str,
+        token_usage: Dict[str, int]
+    ) -> Optional[Dict[str, Any]]:
+        """Extract data from a single page, adding its token usage to token_usage"""
+        logger.info(f"Extracting data from page {page_no}")
+        
+        user_prompt = self.PROMPT_USER_TEMPLATE.format(page_no=page_no)
 
+        cache_key = self._page_cache_key(image_base64) if self.cache_enabled else None
+        cached_page = self._get_cached_page(cache_key, page_no)
+        if cached_page is not None:
+            return cached_page
+        
         try:
-            response = self.client.chat.completions.create(
+            # Downscaling is CPU-bound, so keep it off the event loop
+            llm_image_base64 = await asyncio.to_thread(
+                prepare_image_for_llm, image_base64, self.image_max_dim
+            )
+            
+            response = await self._create_completion(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    self._system_message,
                     {
                         "role": "user",
                         "content": [
                             {"type": "text", "text": user_prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{image_base64}"
-                                }
-                            }
+                            self._image_block(llm_image_base64)
                         ]
                     }
                 ],
-                max_tokens=4000,
-                temperature=0.1
+                max_tokens=self.max_tokens,
+                temperature=self.temperature
             )
             
             # Update token usage
             usage = response.usage
-            self.token_usage["total_tokens"] += usage.total_tokens
-            self.token_usage["input_tokens"] += usage.prompt_tokens
-            self.token_usage["output_tokens"] += usage.completion_tokens
+            token_usage["total_tokens"] += usage.total_tokens
+            token_usage["input_tokens"] += usage.prompt_tokens
+            token_usage["output_tokens"] += usage.completion_tokens
             
             # Parse response
             content = response.choices[0].message.content
             
-            # Extract JSON from response (handle markdown code blocks)
-            json_str = self._extract_json_from_response(content)
-            
-            page_data = json.loads(json_str)
-            
-            # Validate structure
-            if "bill_items" not in page_data:
-                page_data["bill_items"] = []
+            page_data = self._normalize_page(parse_json_response(content))
             
-            # Ensure all required fields are present
-            for item in page_data["bill_items"]:
-                item.setdefault("item_name", "")
-                item.setdefault("item_amount", 0.0)
-                item.setdefault("item_rate", 0.0)
-                item.setdefault("item_quantity", 0.0)
-                
-                # Convert to float
-                try:
-                    item["item_amount"] = float(item["item_amount"])
-                    item["item_rate"] = float(item["item_rate"])
-                    item["item_quantity"] = float(item["item_quantity"])
-                except (ValueError, TypeError):
-                    item["item_amount"] = 0.0
-                    item["item_rate"] = 0.0
-                    item["item_quantity"] = 0.0
+            # Only successfully parsed pages are cached; failures fall through to a retry next time
+            if cache_key is not None:
+                self._page_cache.set(cache_key, copy.deepcopy(page_data))
             
             return page_data
             
@@ -227,28 +554,80 @@ Extract every single line item. Be thorough and accurate."""
                 "page_type": "Bill Detail",
                 "bill_items": []
             }
+
+
+def _coerce_item_numbers(item: Dict[str, Any]):
+    """Convert one item's numeric fields to float, zeroing all three if any is invalid"""
+    try:
+        item["item_amount"] = float(item["item_amount"])
+        item["item_rate"] = float(item["item_rate"])
+        item["item_quantity"] = float(item["item_quantity"])
+    except (ValueError, TypeError):
+        item["item_amount"] = 0.0
+        item["item_rate"] = 0.0
+        item["item_quantity"] = 0.0
+
+
+def coerce_bill_items(items: List[Dict[str, Any]]):
+    """Fill in missing item fields and coerce amount/rate/quantity to float in place"""
+    # Ensure all required fields are present
+    for item in items:
+        item.setdefault("item_name", "")
+        item.setdefault("item_amount", 0.0)
+        item.setdefault("item_rate", 0.0)
+        item.setdefault("item_quantity", 0.0)
+    if not items:
+        return
     
-    def _extract_json_from_response(self, content: str) -> str:
-        """Extract JSON from LLM response (handles markdown code blocks)"""
-        content = content.strip()
-        
-        # Remove markdown code blocks if present
-        if content.startswith("```json"):
-            content = content[7:]
-        elif content.startswith("```"):
-            content = content[3:]
-        
-        if content.endswith("```"):
-            content = content[:-3]
-        
-        content = content.strip()
-        
-        # Find JSON object
-        start_idx = content.find("{")
-        end_idx = content.rfind("}") + 1
-        
-        if start_idx >= 0 and end_idx > start_idx:
-            return content[start_idx:end_idx]
-        
-        return content
+    # Convert the whole page in one numpy pass; any odd value sends rows to the per-item path
+    try:
+        values = np.asarray(
+            [(item["item_amount"], item["item_rate"], item["item_quantity"]) for item in items],
+            dtype=np.float64
+        ).reshape(len(items), 3)
+    except (ValueError, TypeError):
+        for item in items:
+            _coerce_item_numbers(item)
+        return
+    
+    # numpy turns None into NaN where float() would reject it, so those rows keep the old handling
+    invalid_rows = np.isnan(values).any(axis=1)
+    for item, row, invalid in zip(items, values.tolist(), invalid_rows.tolist()):
+        if invalid:
+            _coerce_item_numbers(item)
+        else:
+            item["item_amount"], item["item_rate"], item["item_quantity"] = row
+
+
+def extract_json_from_response(content: str) -> str:
+    """Extract JSON from LLM response (handles markdown code blocks)"""
+    content = content.strip()
+    
+    # Remove markdown code blocks if present
+    if content.startswith("```json"):
+        content = content[7:]
+    elif content.startswith("```"):
+        content = content[3:]
+    
+    if content.endswith("```"):
+        content = content[:-3]
+    
+    content = content.strip()
+    
+    # Find JSON object
+    start_idx = content.find("{")
+    end_idx = content.rfind("}") + 1
+    
+    if start_idx >= 0 and end_idx > start_idx:
+        return content[start_idx:end_idx]
+    
+    return content
+
 
+def parse_json_response(content: str) -> Any:
+    """Parse a JSON-mode response, stripping code fences only if the model ignored JSON mode"""
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch either
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        return orjson.loads(extract_json_from_response(content))
@@ -0,0 +1,25 @@
+"""
+Image Utils - Prepares page images for the vision model
+"""
+
+import pybase64
+from io import BytesIO
+from PIL import Image
+
+
+def prepare_image_for_llm(image_base64: str, max_dim: int = 1536, quality: int = 85) -> str:
+    """
+    Bound the image to max_dim pixels on its longest side and return it as base64 JPEG
+
+    JPEG pages already within the bound are returned untouched to avoid a second lossy pass.
+    """
+    image = Image.open(BytesIO(pybase64.b64decode(image_base64, validate=False)))
+    if image.format == "JPEG" and max(image.size) <= max_dim:
+        return image_base64
+
+    image.thumbnail((max_dim, max_dim), Image.LANCZOS)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    img_buffer = BytesIO()
+    image.save(img_buffer, format="JPEG", quality=quality, optimize=True)
+    return pybase64.b64encode(img_buffer.getbuffer()).decode("ascii")
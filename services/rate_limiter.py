@@ -0,0 +1,53 @@
+"""
+Rate Limiter - Proactive request/token throttling for LLM API calls
+"""
+
+import time
+import asyncio
+from typing import Optional
+
+
+class TokenBucket:
+    """Async token bucket holding up to one minute of capacity, refilled continuously"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.available = per_minute
+        self.refill_per_second = per_minute / 60.0
+        self.last_refill = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self, amount: float = 1.0):
+        """Wait until `amount` units are available and take them"""
+        # Requests larger than the bucket could never be served; cap them at a full bucket
+        amount = min(amount, self.capacity)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Waiters queue on the lock so capacity is handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.available = min(
+                    self.capacity,
+                    self.available + (now - self.last_refill) * self.refill_per_second
+                )
+                self.last_refill = now
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                await asyncio.sleep((amount - self.available) / self.refill_per_second)
+
+
+class RateLimiter:
+    """Keeps LLM calls under requests-per-minute and tokens-per-minute budgets (0 disables a budget)"""
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+
+    async def acquire(self, estimated_tokens: int):
+        """Wait for budget for one request using roughly `estimated_tokens` tokens"""
+        if self._requests is not None:
+            await self._requests.acquire(1)
+        if self._tokens is not None:
+            await self._tokens.acquire(estimated_tokens)
@@ -2,14 +2,26 @@
 Validation Engine - Validates and deduplicates extracted bill data
 """
 
+import re
 import logging
-from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple, FrozenSet
 
 logger = logging.getLogger(__name__)
 
 
 class ValidationEngine:
     """Validates and deduplicates extracted bill data"""
+
+    _TOTAL_KEYWORDS = (
+        "total", "subtotal", "sub-total", "grand total",
+        "final total", "net amount", "amount due",
+        "balance", "sum", "total amount", "final amount"
+    )
+    # A total keyword on its own, optionally with one leading or trailing separator
+    _TOTAL_RE = re.compile(
+        r"(?:[-:=]\s*)?(?:{alt})|(?:{alt})(?:\s*[-:=])?".format(alt="|".join(map(re.escape, _TOTAL_KEYWORDS)))
+    )
     
     def __init__(self):
         self.similarity_threshold = 0.8
@@ -41,7 +53,9 @@ class ValidationEngine:
         item_name = str(item.get("item_name", "")).strip()
         if not item_name or len(item_name) < 2:
             return None
-        if self._is_total_or_subtotal(item_name):
+        # Normalized once here; dedup reads the private keys and removes them
+        name_norm = item_name.lower()
+        if self._is_total_or_subtotal(name_norm):
             return None
         try:
             item_amount = float(item.get("item_amount", 0.0))
@@ -54,21 +68,13 @@ class ValidationEngine:
             "item_name": item_name,
             "item_amount": item_amount,
             "item_rate": item_rate,
-            "item_quantity": item_quantity
+            "item_quantity": item_quantity,
+            "_name_norm": name_norm,
+            "_name_tokens": frozenset(name_norm.split())
         }
 
-    def _is_total_or_subtotal(self, item_name: str) -> bool:
-        item_lower = item_name.lower().strip()
-        total_keywords = [
-            "total", "subtotal", "sub-total", "grand total",
-            "final total", "net amount", "amount due",
-            "balance", "sum", "total amount", "final amount"
-        ]
-        for keyword in total_keywords:
-            if keyword in item_lower and len(item_lower) < 30:
-                if item_lower.replace(keyword, "").strip() in ["", "-", ":", "="]:
-                    return True
-        return False
+    def _is_total_or_subtotal(self, name_norm: str) -> bool:
+        return len(name_norm) < 30 and self._TOTAL_RE.fullmatch(name_norm) is not None
 
     def _normalize_page_type(self, page_type: str) -> str:
         page_type_lower = page_type.lower().strip()
@@ -80,44 +86,47 @@ class ValidationEngine:
             return "Bill Detail"
 
     def _deduplicate_items(self, pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        seen_items = []
+        # Only names and amounts of kept items are remembered; the item dicts are never copied
+        seen_exact = set()  # normalized names; an identical name is a duplicate whatever the amount
+        seen_items = []  # (name tokens, amount) of kept items
+        # Fuzzy candidates are the kept items sharing at least one name token
+        token_index = defaultdict(list)  # name token -> indices into seen_items
         deduplicated_pages = []
         for page in pages:
             deduplicated_page = {"page_no": page["page_no"], "page_type": page["page_type"], "bill_items": []}
             for item in page["bill_items"]:
-                is_duplicate = False
-                for seen_item in seen_items:
-                    if self._are_items_duplicate(item, seen_item):
-                        is_duplicate = True
-                        logger.info(f"Found duplicate item: '{item['item_name']}' (page {page['page_no']})")
-                        break
-                if not is_duplicate:
-                    item_with_page = item.copy()
-                    item_with_page["page_no"] = page["page_no"]
-                    seen_items.append(item_with_page)
-                    deduplicated_page["bill_items"].append(item)
+                name_norm = item.pop("_name_norm")
+                name_tokens = item.pop("_name_tokens")
+                if name_norm in seen_exact:
+                    logger.info(f"Found duplicate item: '{item['item_name']}' (page {page['page_no']})")
+                    continue
+                candidates = set()
+                for token in name_tokens:
+                    candidates.update(token_index.get(token, ()))
+                if self._has_fuzzy_duplicate(name_tokens, item["item_amount"], [seen_items[idx] for idx in candidates]):
+                    logger.info(f"Found duplicate item: '{item['item_name']}' (page {page['page_no']})")
+                    continue
+                seen_exact.add(name_norm)
+                for token in name_tokens:
+                    token_index[token].append(len(seen_items))
+                seen_items.append((name_tokens, item["item_amount"]))
+                deduplicated_page["bill_items"].append(item)
             deduplicated_pages.append(deduplicated_page)
         return deduplicated_pages
 
-    def _are_items_duplicate(self, item1: Dict[str, Any], item2: Dict[str, Any]) -> bool:
-        name1 = item1["item_name"].lower().strip()
-        name2 = item2["item_name"].lower().strip()
-        if name1 == name2:
-            return True
-        name_similarity = self._calculate_name_similarity(name1, name2)
-        amount_diff = abs(item1["item_amount"] - item2["item_amount"])
-        if name_similarity > self.similarity_threshold:
-            if amount_diff < 0.01 or (amount_diff / max(abs(item1["item_amount"]), 0.01)) < 0.05:
-                return True
-        return False
+    def _has_fuzzy_duplicate(self, name_tokens: FrozenSet[str], amount: float,
+                             candidates: List[Tuple[FrozenSet[str], float]]) -> bool:
+        return any(
+            self._calculate_name_similarity(name_tokens, seen_tokens) > self.similarity_threshold
+            and self._are_amounts_close(amount, seen_amount)
+            for seen_tokens, seen_amount in candidates
+        )
 
-    def _calculate_name_similarity(self, name1: str, name2: str) -> float:
-        words1 = set(name1.split())
-        words2 = set(name2.split())
-        if not words1 or not words2:
-            return 0.0
-        intersection = len(words1.intersection(words2))
-        union = len(words1.union(words2))
-        if union == 0:
+    def _calculate_name_similarity(self, tokens1: FrozenSet[str], tokens2: FrozenSet[str]) -> float:
+        if not tokens1 or not tokens2:
             return 0.0
-        return intersection / union
+        return len(tokens1 & tokens2) / len(tokens1 | tokens2)
+
+    def _are_amounts_close(self, amount1: float, amount2: float) -> bool:
+        amount_diff = abs(amount1 - amount2)
+        return amount_diff < 0.01 or (amount_diff / max(abs(amount1), 0.01)) < 0.05
@@ -6,8 +6,12 @@ import requests
 import json
 import sys
 
+from tools.http_session import create_session
+
 API_URL = "http://localhost:8000/extract-bill-data"
 
+_SESSION = create_session()
+
 
 def test_extraction(document_url: str):
     """Test the bill extraction endpoint"""
@@ -16,7 +20,7 @@ def test_extraction(document_url: str):
     print("-" * 60)
     
     try:
-        response = requests.post(
+        response = _SESSION.post(
             API_URL,
             json={"document": document_url},
             timeout=120  # Allow time for processing
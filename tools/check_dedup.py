@@ -0,0 +1,79 @@
+"""
+Regression check for cross-page item deduplication.
+
+Usage:
+  python tools\check_dedup.py
+
+Runs both validators on item pairs that share most of their name but are
+distinct charges, and on pairs that really are repeats. Exits non-zero if any
+pair is merged or kept against expectations.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.data_validator import DataValidator  # noqa: E402
+from services.validator import ValidationEngine  # noqa: E402
+
+# Distinct items with the same amount on consecutive pages; both must be kept
+DISTINCT_PAIRS = [
+    ("Room Rent Day 1", "Room Rent Day 2"),
+    ("Consultation Dr Sharma", "Consultation Dr Verma"),
+    ("Blood Test CBC", "Blood Test LFT"),
+    ("Item 3", "Item 4"),
+]
+
+# Repeats of one item; the second must be dropped
+DUPLICATE_PAIRS = [
+    # Identical name, whatever the amount
+    (("Paracetamol 500mg", 50.0), ("paracetamol 500mg", 75.0)),
+    # Same tokens in another order, close amount
+    (("Injection Ceftriaxone 1g Vial", 120.0), ("Injection Ceftriaxone Vial 1g", 121.0)),
+    # Same tokens with a different first word
+    (("Tab Paracetamol 500mg", 30.0), ("Paracetamol 500mg Tab", 30.0)),
+]
+
+
+def _pages(first, second):
+    (name1, amount1), (name2, amount2) = first, second
+    return [
+        {"page_no": "1", "page_type": "Bill Detail",
+         "bill_items": [{"item_name": name1, "item_amount": amount1, "item_rate": amount1, "item_quantity": 1}]},
+        {"page_no": "2", "page_type": "Bill Detail",
+         "bill_items": [{"item_name": name2, "item_amount": amount2, "item_rate": amount2, "item_quantity": 1}]},
+    ]
+
+
+def _kept_count(validator, first, second) -> int:
+    pages = validator.validate_and_deduplicate(_pages(first, second))
+    return sum(len(page["bill_items"]) for page in pages)
+
+
+def check(validator) -> list:
+    failures = []
+    for name1, name2 in DISTINCT_PAIRS:
+        if _kept_count(validator, (name1, 100.0), (name2, 100.0)) != 2:
+            failures.append(f"merged distinct items '{name1}' and '{name2}'")
+    for first, second in DUPLICATE_PAIRS:
+        if _kept_count(validator, first, second) != 1:
+            failures.append(f"kept duplicate '{second[0]}' of '{first[0]}'")
+    return failures
+
+
+def main():
+    failures = []
+    for validator in (ValidationEngine(), DataValidator()):
+        failures.extend(f"{type(validator).__name__}: {failure}" for failure in check(validator))
+
+    if failures:
+        print("Deduplication check FAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("Deduplication check passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,17 +9,17 @@ pretty-printed JSON files.
 """
 
 import sys
-import json
+import orjson
 import difflib
 
 
 def load_json(path: str):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
 
 
 def pretty_json(data) -> str:
-    return json.dumps(data, ensure_ascii=False, indent=2, sort_keys=True)
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS).decode("utf-8")
 
 
 def main():
@@ -33,13 +33,14 @@ def main():
     a = load_json(a_path)
     b = load_json(b_path)
 
-    a_pretty = pretty_json(a).splitlines(keepends=True)
-    b_pretty = pretty_json(b).splitlines(keepends=True)
-
+    # Equal responses are the common case; only pretty-print when there is a diff to show
     if a == b:
         print("Responses are IDENTICAL.")
         sys.exit(0)
 
+    a_pretty = pretty_json(a).splitlines(keepends=True)
+    b_pretty = pretty_json(b).splitlines(keepends=True)
+
     print("Responses DIFFER. Showing unified diff:\n")
     diff = difflib.unified_diff(a_pretty, b_pretty, fromfile=a_path, tofile=b_path)
     sys.stdout.writelines(diff)
@@ -0,0 +1,21 @@
+"""
+Shared requests session for the scripts that call the running API.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def create_session() -> requests.Session:
+    """Pooled keep-alive session; the extraction endpoint is idempotent, so gateway errors on POST are retried"""
+    session = requests.Session()
+    # Slow extractions are not re-sent (read=0), and the last error response is returned rather than raised
+    retry = Retry(
+        total=3, read=0, backoff_factor=0.5, status_forcelist=[502, 503, 504],
+        allowed_methods=["GET", "POST"], raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -8,11 +8,18 @@ This posts to http://127.0.0.1:8000/extract-bill-data and writes a deterministic
 JSON file (sorted keys, pages/items sorted) so responses can be compared reliably.
 """
 
+import os
 import sys
-import json
+import orjson
 import requests
 from typing import Any, Dict, List
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.http_session import create_session  # noqa: E402
+
+_SESSION = create_session()
+
 
 def normalize_response(resp: Dict[str, Any]) -> Dict[str, Any]:
     """Normalize response structure for deterministic comparison."""
@@ -55,7 +62,7 @@ def main():
     payload = {"document": document_url}
 
     print(f"Posting to {api_url}...")
-    resp = requests.post(api_url, json=payload, timeout=180)
+    resp = _SESSION.post(api_url, json=payload, timeout=180)
     try:
         resp.raise_for_status()
     except requests.RequestException as e:
@@ -66,8 +73,8 @@ def main():
     result = resp.json()
     normalized = normalize_response(result)
 
-    with open(out_file, "w", encoding="utf-8") as f:
-        json.dump(normalized, f, ensure_ascii=False, indent=2, sort_keys=True)
+    with open(out_file, "wb") as f:
+        f.write(orjson.dumps(normalized, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
 
     print(f"Saved normalized response to {out_file}")
 